@@ -1,94 +1,141 @@
+import threading
+
+import orjson
 from fastapi.openapi.utils import get_openapi
+from starlette.responses import Response
 from config import CORS_ORIGINS, PROJECT_NAME, VERSION
 
 origins = CORS_ORIGINS
 
-def custom_openapi(app):
-    if app.openapi_schema:
-        return app.openapi_schema
-
-    openapi_schema = get_openapi(
-        title=PROJECT_NAME,
-        version=VERSION,
-        description="""
+# Статичные части схемы собираются один раз при импорте модуля
+_DESCRIPTION = """
         # Управление космическим складом 🚀
-        
+
         Это API предоставляет функционал для:
-        
+
         ## Звездолеты
         * Просмотр списка доступных звездолетов
         * Управление характеристиками звездолетов
         * Отслеживание статуса звездолетов
-        
+
         ## Грузы
         * Управление инвентарем склада
         * Отслеживание количества грузов
         * Контроль веса и объема
-        
+
         ## Погрузка
         * Создание заявок на погрузку
         * Отмена погрузки
         * История операций
-        
+
         ## Статусы звездолетов
         * `available` - доступен для погрузки
         * `maintenance` - на техобслуживании
         * `in_flight` - в полете
         * `loading` - идет погрузка
-        
+
         ## Аутоматическая очистка
         Система автоматически очищает:
         * Записи истории старше 24 часов
         * Зависшие погрузки
-        """,
-        routes=app.routes,
-    )
+        """
 
-    # Добавляем примеры для некоторых схем
-    openapi_schema["components"]["schemas"]["Starship"]["example"] = {
+# Примеры для некоторых схем
+_EXAMPLES = {
+    "Starship": {
         "id": 1,
         "name": "Millennium Falcon",
         "capacity": 100000,
         "range": 1000000,
         "status": "available"
-    }
-
-    openapi_schema["components"]["schemas"]["Cargo"]["example"] = {
+    },
+    "Cargo": {
         "id": 1,
         "name": "Dilithium Crystals",
         "quantity": 100,
         "weight": 10.5,
         "volume": 2.3
-    }
-
-    openapi_schema["components"]["schemas"]["ShipmentResponse"]["example"] = {
+    },
+    "ShipmentResponse": {
         "id": 1,
         "starship_id": 1,
         "cargo_id": 1,
         "quantity": 50,
         "status": "loading",
         "created_at": "2024-03-20T10:30:00"
+    },
+}
+
+# Теги для группировки эндпоинтов
+_TAGS = [
+    {
+        "name": "starships",
+        "description": "Операции со звездолетами"
+    },
+    {
+        "name": "cargo",
+        "description": "Операции с грузами"
+    },
+    {
+        "name": "shipments",
+        "description": "Операции с погрузками"
+    },
+    {
+        "name": "history",
+        "description": "История операций"
     }
+]
+
+# Схема строится один раз: при холодном старте несколько одновременных
+# запросов к /openapi.json не должны каждый раз обходить все роуты.
+_schema_lock = threading.Lock()
 
-    # Добавляем теги для группировки эндпоинтов
-    openapi_schema["tags"] = [
-        {
-            "name": "starships",
-            "description": "Операции со звездолетами"
-        },
-        {
-            "name": "cargo",
-            "description": "Операции с грузами"
-        },
-        {
-            "name": "shipments",
-            "description": "Операции с погрузками"
-        },
-        {
-            "name": "history",
-            "description": "История операций"
-        }
-    ]
-
-    app.openapi_schema = openapi_schema
+
+def generate_operation_id(route):
+    """operationId вида <тег>_<имя функции> вместо длинного автосгенерированного."""
+    if route.tags:
+        return f"{route.tags[0]}_{route.name}"
+    return route.name
+
+
+def custom_openapi(app):
+    if app.openapi_schema:
+        return app.openapi_schema
+
+    with _schema_lock:
+        if app.openapi_schema:
+            return app.openapi_schema
+        app.openapi_schema = _build_openapi(app)
     return app.openapi_schema
+
+
+_openapi_body = None
+
+
+def openapi_response(app):
+    """Отдаёт схему как заранее сериализованные байты.
+
+    JSON кодируется один раз при первом запросе, дальше /openapi.json
+    не обходит схему и не сериализует её заново.
+    """
+    global _openapi_body
+    if _openapi_body is None:
+        _openapi_body = orjson.dumps(custom_openapi(app))
+    return Response(content=_openapi_body, media_type="application/json")
+
+
+def _build_openapi(app):
+    openapi_schema = get_openapi(
+        title=PROJECT_NAME,
+        version=VERSION,
+        description=_DESCRIPTION,
+        routes=app.routes,
+    )
+
+    schemas = openapi_schema.setdefault("components", {}).setdefault("schemas", {})
+    for name, example in _EXAMPLES.items():
+        if name in schemas:
+            schemas[name]["example"] = example
+
+    openapi_schema["tags"] = _TAGS
+    return openapi_schema
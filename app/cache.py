@@ -0,0 +1,73 @@
+import logging
+
+from config import REDIS_URL, CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Кэш готовых ответов для редко меняющихся списков (звездолеты, грузы).
+# У каждого пространства имен есть счетчик поколений: запись кэша хранится
+# под ключом с поколением, а сброс после изменения данных — один INCR.
+# Ответ, собранный до изменения, сохраняется под старым поколением и уже
+# никогда не будет прочитан, даже если запишется после сброса. Каждая
+# запись — отдельный ключ со своим TTL (SET ... EX), поэтому ни одна
+# не живет дольше CACHE_TTL_SECONDS.
+# Без REDIS_URL кэш выключен и запросы идут прямо в БД, а клиент redis
+# даже не импортируется: это заметная часть времени старта процесса.
+# Обработчики except ниже выполняются только при включенном кэше.
+if REDIS_URL:
+    import redis
+
+    _client = redis.Redis.from_url(REDIS_URL, socket_timeout=0.5)
+else:
+    _client = None
+
+
+def _generation_key(namespace):
+    return f"cache:{namespace}:generation"
+
+
+def _entry_key(namespace, generation, key):
+    return f"cache:{namespace}:{generation}:{key}"
+
+
+def generation(namespace):
+    """Текущее поколение пространства имен; None, если кэш недоступен.
+    Читать его нужно до построения ответа, который потом сохраняется."""
+    if _client is None:
+        return None
+    try:
+        return int(_client.get(_generation_key(namespace)) or 0)
+    except redis.RedisError as e:
+        logger.warning("Cache read failed: %s", e)
+        return None
+
+
+def get(namespace, generation, key):
+    if generation is None:
+        return None
+    try:
+        return _client.get(_entry_key(namespace, generation, key))
+    except redis.RedisError as e:
+        logger.warning("Cache read failed: %s", e)
+        return None
+
+
+def store(namespace, generation, key, body):
+    if generation is None:
+        return
+    try:
+        _client.set(_entry_key(namespace, generation, key), body, ex=CACHE_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning("Cache write failed: %s", e)
+
+
+def invalidate(*namespaces):
+    if _client is None:
+        return
+    try:
+        pipe = _client.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.incr(_generation_key(namespace))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Cache invalidation failed: %s", e)
@@ -1,44 +1,124 @@
 import logging
-from datetime import datetime, timedelta
-from app import models
-from db import get_db
-from config import CLEANUP_HISTORY_DAYS, STUCK_LOADING_HOURS
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, select, text, update
+from app import cache, models
+from app.db import SessionLocal
+from config import (
+    CLEANUP_HISTORY_DAYS,
+    STUCK_LOADING_HOURS,
+    CLEANUP_BATCH_SIZE,
+    CLEANUP_SHIPS_BATCH_SIZE,
+)
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _drop_expired_partitions(db, cutoff):
+    """Удаляет месячные партиции истории, целиком лежащие раньше cutoff.
+
+    Работает, только если shipment_history в Postgres партиционирована
+    по RANGE (created_at) с партициями вида shipment_history_YYYYMM.
+    Для обычной таблицы ничего не делает — остаётся построчный DELETE.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+
+    # Партиции ищутся по OID родителя (regclass), а не по имени таблицы:
+    # одноименные таблицы в других схемах не попадут в выборку. Удаляется
+    # партиция по имени с явной схемой, а не через search_path
+    preparer = db.get_bind().dialect.identifier_preparer
+    history_table = models.ShipmentHistory.__table__
+    parent = history_table.name
+    partitions = db.execute(text("""
+        SELECT namespace.nspname, child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_namespace namespace ON namespace.oid = child.relnamespace
+        WHERE pg_inherits.inhparent = CAST(:parent AS regclass)
+    """), {"parent": preparer.format_table(history_table)}).all()
+
+    cutoff_month = f"{cutoff.year:04d}{cutoff.month:02d}"
+    dropped = 0
+    for schema, name in partitions:
+        month = name[len(parent) + 1:]
+        if name.startswith(parent + "_") and len(month) == 6 and month.isdigit() and month < cutoff_month:
+            db.execute(text(
+                f"DROP TABLE IF EXISTS {preparer.quote_schema(schema)}.{preparer.quote(name)}"
+            ))
+            dropped += 1
+    db.commit()
+    return dropped
+
+
 def cleanup_old_data():
-    db = next(get_db())
-    try:
-        # Удаляем записи старше N дней
-        days_ago = datetime.utcnow() - timedelta(days=CLEANUP_HISTORY_DAYS)
-        deleted_count = db.query(models.ShipmentHistory).filter(
-            models.ShipmentHistory.created_at < days_ago
-        ).delete()
-        logger.info(f"Deleted {deleted_count} old shipment records")
-
-        # Освобождаем корабли
-        hours_ago = datetime.utcnow() - timedelta(hours=STUCK_LOADING_HOURS)
-        ships_to_free = db.query(models.Starship).filter(
-            models.Starship.status == models.StarshipStatus.LOADING
-        ).all()
-
-        freed_count = 0
-        for ship in ships_to_free:
-            latest_shipment = db.query(models.ShipmentHistory).filter(
-                models.ShipmentHistory.starship_id == ship.id
-            ).order_by(models.ShipmentHistory.created_at.desc()).first()
-
-            if latest_shipment and latest_shipment.created_at < hours_ago:
-                ship.status = models.StarshipStatus.AVAILABLE
-                freed_count += 1
-
-        logger.info(f"Freed {freed_count} stuck ships")
-        db.commit()
-    except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    if SessionLocal is None:
+        raise RuntimeError("DATABASE_URL не задан — очищать нечего")
+
+    with SessionLocal() as db:
+        try:
+            now = datetime.now(timezone.utc)
+
+            # Удаляем записи старше N дней
+            days_ago = now - timedelta(days=CLEANUP_HISTORY_DAYS)
+            # Старые месячные партиции (если таблица партиционирована)
+            # сбрасываются целиком, без построчного DELETE
+            dropped = _drop_expired_partitions(db, days_ago)
+            if dropped:
+                logger.info("Dropped %d expired shipment history partitions", dropped)
+
+            # Удаляем пачками, чтобы не держать длинную транзакцию на большой таблице
+            deleted_count = 0
+            while True:
+                batch_ids = select(models.ShipmentHistory.id).where(
+                    models.ShipmentHistory.created_at < days_ago
+                ).limit(CLEANUP_BATCH_SIZE)
+                deleted = db.execute(
+                    delete(models.ShipmentHistory)
+                    .where(models.ShipmentHistory.id.in_(batch_ids))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+                deleted_count += deleted
+                if deleted < CLEANUP_BATCH_SIZE:
+                    break
+            logger.info("Deleted %d old shipment records", deleted_count)
+
+            # Освобождаем корабли
+            hours_ago = now - timedelta(hours=STUCK_LOADING_HOURS)
+            # Корабли, последняя погрузка которых старше порога, — одним
+            # запросом вместо отдельного SELECT на каждый корабль
+            stuck_ids = select(models.ShipmentHistory.starship_id).group_by(
+                models.ShipmentHistory.starship_id
+            ).having(func.max(models.ShipmentHistory.created_at) < hours_ago)
+
+            # Забираем зависшие корабли пачками под FOR UPDATE SKIP LOCKED:
+            # строки, уже захваченные параллельным воркером очистки, пропускаются.
+            # Захват и смена статуса — один UPDATE ... RETURNING на пачку,
+            # без отдельного SELECT и без загрузки объектов Starship
+            freed_count = 0
+            while True:
+                claimed_ids = select(models.Starship.id).where(
+                    models.Starship.status == models.StarshipStatus.LOADING,
+                    models.Starship.id.in_(stuck_ids)
+                ).limit(CLEANUP_SHIPS_BATCH_SIZE).with_for_update(skip_locked=True)
+
+                freed = db.execute(
+                    update(models.Starship)
+                    .where(models.Starship.id.in_(claimed_ids))
+                    .values(status=models.StarshipStatus.AVAILABLE)
+                    .returning(models.Starship.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                db.commit()
+                freed_count += len(freed)
+                if len(freed) < CLEANUP_SHIPS_BATCH_SIZE:
+                    break
+
+            logger.info("Freed %d stuck ships", freed_count)
+            if freed_count:
+                cache.invalidate("starships")
+            db.commit()
+        except Exception as e:
+            logger.error("Error during cleanup: %s", e)
+            db.rollback()
+            raise
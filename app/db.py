@@ -1,13 +1,59 @@
+import logging
+import time
+
 from fastapi import HTTPException
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
-from .models import Base
-from config import DATABASE_URL
+from .models import Base, Cargo
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+
+def log_slow_queries(engine):
+    """Пишет в лог только запросы дольше SLOW_QUERY_MS.
+
+    В отличие от echo=True, который форматирует и выводит каждый запрос,
+    здесь на быстрый запрос уходят лишь два замера времени.
+    """
+    threshold_ns = SLOW_QUERY_MS * 1_000_000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start_ns"] = time.perf_counter_ns()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def log_if_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ns = time.perf_counter_ns() - conn.info["query_start_ns"]
+        if elapsed_ns >= threshold_ns:
+            logger.warning(
+                "Медленный запрос (%.1f мс): %s",
+                elapsed_ns / 1_000_000,
+                statement,
+                extra={"duration_ms": elapsed_ns / 1_000_000, "statement": statement},
+            )
+
 
 # create_engine не открывает соединение немедленно — это безопасно при импорте.
 # Если DATABASE_URL не задан, не падаем при импорте: движок будет None, а
 # get_db вернёт понятную 503.
-engine = create_engine(DATABASE_URL) if DATABASE_URL else None
+# pool_pre_ping отсеивает соединения, которые БД уже закрыла, а pool_recycle
+# периодически пересоздаёт долгоживущие соединения. pool_use_lifo отдаёт
+# последнее возвращённое соединение: при спаде нагрузки лишние соединения
+# простаивают и закрываются, а не крутятся по кругу.
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_use_lifo=True,
+) if DATABASE_URL else None
+
+
+if engine is not None:
+    log_slow_queries(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) if engine else None
 
@@ -25,15 +71,74 @@ def init_models():
     if engine is None:
         raise RuntimeError("DATABASE_URL не задан — нечего инициализировать")
     Base.metadata.create_all(bind=engine)
+    add_cargo_name_unique_index()
 
-# Dependency
-def get_db():
+
+# Уникальность названия груза держится на уникальном индексе ix_cargo_name.
+# Пока его наличие в БД не подтверждено при старте, обработчики грузов
+# проверяют название отдельным запросом перед записью
+_cargo_name_unique = False
+
+
+def cargo_name_is_unique():
+    """True, если БД сама не допускает грузов с одинаковым названием."""
+    return _cargo_name_unique
+
+
+def _has_unique_cargo_name(conn):
+    inspector = inspect(conn)
+    return any(
+        index["unique"] and index["column_names"] == ["name"]
+        for index in inspector.get_indexes(Cargo.__tablename__)
+    ) or any(
+        constraint["column_names"] == ["name"]
+        for constraint in inspector.get_unique_constraints(Cargo.__tablename__)
+    )
+
+
+def add_cargo_name_unique_index():
+    """Делает индекс ix_cargo_name уникальным в базах, созданных до того,
+    как название груза стало уникальным: create_all существующие таблицы
+    не меняет. Если в таблице уже есть повторяющиеся названия, индекс не
+    создается, а уникальность и дальше проверяется в обработчиках."""
+    name_index = next(index for index in Cargo.__table__.indexes if index.name == "ix_cargo_name")
+    try:
+        with engine.begin() as conn:
+            if _has_unique_cargo_name(conn):
+                return
+            name_index.drop(conn, checkfirst=True)
+            name_index.create(conn)
+        logger.info("Индекс ix_cargo_name пересоздан как уникальный")
+    except SQLAlchemyError:
+        logger.exception(
+            "Не удалось создать уникальный индекс ix_cargo_name — возможно, "
+            "в таблице cargo есть повторяющиеся названия"
+        )
+
+
+def check_cargo_name_unique():
+    """Проверяет при старте, обеспечивает ли БД уникальность названий грузов."""
+    global _cargo_name_unique
+    with engine.connect() as conn:
+        _cargo_name_unique = _has_unique_cargo_name(conn)
+    if not _cargo_name_unique:
+        logger.warning(
+            "В БД нет уникального индекса на cargo.name — уникальность "
+            "названий грузов проверяется отдельным запросом"
+        )
+
+def open_session():
+    """Открывает сессию; без DATABASE_URL отвечает понятной 503."""
     if SessionLocal is None:
         raise HTTPException(
             status_code=503,
             detail="База данных не настроена: не задан DATABASE_URL",
         )
-    db = SessionLocal()
+    return SessionLocal()
+
+# Dependency
+def get_db():
+    db = open_session()
     try:
         yield db
     finally:
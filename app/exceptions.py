@@ -1,25 +1,41 @@
+import orjson
 from fastapi.exceptions import RequestValidationError
 from starlette import status
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from starlette.responses import JSONResponse
+from starlette.responses import Response
+
+from app.responses import ORJSONResponse
+
+# Тело ответа 500 не меняется, поэтому сериализуем его один раз
+_INTERNAL_ERROR_BODY = orjson.dumps({"detail": "Внутренняя ошибка сервера"})
+
+# В ответ 422 отдаём не больше N ошибок и без тяжёлых полей: огромный
+# невалидный payload не должен раздувать ответ и время его сериализации
+_MAX_VALIDATION_ERRORS = 20
+_OMITTED_ERROR_KEYS = frozenset({"input", "ctx", "url"})
 
 
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
 
 
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
+    errors = [
+        {key: value for key, value in error.items() if key not in _OMITTED_ERROR_KEYS}
+        for error in exc.errors()[:_MAX_VALIDATION_ERRORS]
+    ]
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"detail": "Ошибка валидации данных", "errors": exc.errors()}
+        content={"detail": "Ошибка валидации данных", "errors": errors}
     )
 
 
 async def general_exception_handler(request, exc):
-    return JSONResponse(
+    return Response(
+        content=_INTERNAL_ERROR_BODY,
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={"detail": "Внутренняя ошибка сервера"}
+        media_type="application/json"
     )
@@ -1,5 +1,17 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-# Создаем лимитер
-limiter = Limiter(key_func=get_remote_address) 
\ No newline at end of file
+from config import RATE_LIMIT_PER_MINUTE, RATE_LIMIT_STORAGE_URI, RATE_LIMIT_STRATEGY
+
+# Создаем лимитер. Со storage в Redis счетчики общие для всех воркеров и
+# реплик; если Redis недоступен, лимитер временно считает в памяти процесса.
+# Общий лимит default_limits применяет SlowAPIASGIMiddleware ко всем роутам
+# без собственного @limiter.limit; отдельные лимиты остаются только у
+# тяжелых и изменяющих склад операций.
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=[RATE_LIMIT_PER_MINUTE["default"]],
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True,
+)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, CheckConstraint, Index, func
 from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime
+from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
 import enum
 
 Base = declarative_base()
@@ -21,7 +22,11 @@ class Starship(Base):
     capacity = Column(Float, nullable=False)  # в килограммах
     volume = Column(Float, nullable=False)  # объем единицы в м³
     range = Column(Float, nullable=False)  # в километрах
-    status = Column(Enum(StarshipStatus, name="starshipstatus", create_type=False), default=StarshipStatus.AVAILABLE, nullable=False)
+    status = Column(Enum(StarshipStatus, name="starshipstatus"), default=StarshipStatus.AVAILABLE, nullable=False, index=True)
+
+    # Связи без неявной ленивой загрузки: нужные данные подгружаются явно
+    # через options(...) в месте запроса, случайное обращение падает сразу
+    history = relationship("ShipmentHistory", back_populates="starship", lazy="raise")
 
     # Добавляем ограничения
     __table_args__ = (
@@ -35,11 +40,13 @@ class Cargo(Base):
     __tablename__ = "cargo"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), index=True, nullable=False)
+    name = Column(String(100), unique=True, index=True, nullable=False)
     quantity = Column(Integer, nullable=False)
     weight = Column(Float, nullable=False)  # вес единицы в кг
     volume = Column(Float, nullable=False)  # объем единицы в м³
 
+    history = relationship("ShipmentHistory", back_populates="cargo", lazy="raise")
+
     # Добавляем ограничения
     __table_args__ = (
         CheckConstraint('quantity >= 0', name='check_non_negative_quantity'),
@@ -64,5 +71,25 @@ class ShipmentHistory(Base):
     starship_id = Column(Integer, ForeignKey("starships.id"))
     cargo_id = Column(Integer, ForeignKey("cargo.id"))
     quantity = Column(Integer)
-    status = Column(Enum(ShipmentStatus, name="shipmentstatus", create_type=False))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(Enum(ShipmentStatus, name="shipmentstatus"))
+    # Время ставит приложение, а server_default покрывает вставки в обход ORM.
+    # create_all не меняет существующие таблицы, поэтому в старых базах у
+    # колонки нет DEFAULT, и без default на стороне Python туда попал бы NULL
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+        index=True
+    )
+
+    starship = relationship("Starship", back_populates="history", lazy="raise")
+    cargo = relationship("Cargo", back_populates="history", lazy="raise")
+
+    # Индексы под выборки очистки (последняя погрузка корабля, диапазон по дате),
+    # расчет текущей загрузки корабля и фильтры истории по грузу
+    __table_args__ = (
+        Index('ix_shipment_history_ship_created', 'starship_id', 'created_at'),
+        Index('ix_shipment_history_ship_status', 'starship_id', 'status'),
+        Index('ix_shipment_history_cargo_status', 'cargo_id', 'status'),
+    )
@@ -0,0 +1,9 @@
+import orjson
+from starlette.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ, сериализуемый через orjson (быстрее стандартного json.dumps)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
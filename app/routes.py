@@ -1,58 +1,213 @@
+import hashlib
+from itertools import chain
+
+import orjson
 from fastapi import APIRouter, Depends, Query, Body, HTTPException, Path, Request
+from sqlalchemy import case, exists, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette import status
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
 from datetime import datetime
 from typing import List, Optional
 
-from app import schemas, models
-from app.db import get_db
+from app import cache, schemas, models
+from app.db import cargo_name_is_unique, get_db, open_session
 from app.limiter import limiter
-from config import RATE_LIMIT_PER_MINUTE
+from app.responses import ORJSONResponse
+from config import HISTORY_STREAM_BATCH_SIZE, RATE_LIMIT_PER_MINUTE
 from app.security import get_current_user
 
+# Обработчики объявлены обычными def, а не async def: они работают с
+# синхронной Session, и FastAPI выполняет их в пуле потоков, не блокируя
+# event loop на запросах к БД.
 router = APIRouter()
 
+def error_response(description: str, detail: str):
+    """Описание ответа с ошибкой для OpenAPI с примером тела."""
+    return {
+        "description": description,
+        "content": {
+            "application/json": {
+                "example": {"detail": detail}
+            }
+        }
+    }
+
+# Общие описания ответов для OpenAPI: один и тот же объект используется
+# всеми роутами, а не собирается заново в каждом декораторе
+SERVER_ERROR_500 = error_response("Внутренняя ошибка сервера", "Внутренняя ошибка сервера")
+STARSHIP_NOT_FOUND_404 = {"description": "Звездолет не найден"}
+CARGO_NOT_FOUND_404 = {"description": "Груз не найден"}
+STARSHIP_NAME_TAKEN_400 = error_response("Ошибка валидации", "Звездолет с таким именем уже существует")
+CARGO_NAME_TAKEN_400 = error_response("Ошибка валидации", "Груз с таким названием уже существует")
+
+# Перевод статусов в истории погрузок делается в SQL выражением CASE,
+# поэтому строки приходят из БД уже с готовой подписью статуса
+HISTORY_STATUS_LABEL = case(
+    (models.ShipmentHistory.status == models.ShipmentStatus.LOADING, 'Loading'),
+    (models.ShipmentHistory.status == models.ShipmentStatus.COMPLETED, 'Completed'),
+    (models.ShipmentHistory.status == models.ShipmentStatus.CANCELLED, 'Cancelled'),
+    (models.ShipmentHistory.status == models.ShipmentStatus.FAILED, 'failed')
+).label('status')
+
+# Списки выбирают только колонки, попадающие в ответ: строки приходят
+# кортежами, без создания ORM-объектов и записи в identity map
+STARSHIP_LIST_COLUMNS = (
+    models.Starship.id,
+    models.Starship.name,
+    models.Starship.capacity,
+    models.Starship.volume,
+    models.Starship.range,
+    models.Starship.status
+)
+CARGO_LIST_COLUMNS = (
+    models.Cargo.id,
+    models.Cargo.name,
+    models.Cargo.quantity,
+    models.Cargo.weight,
+    models.Cargo.volume
+)
+
+# Списочные эндпоинты отдают строки из БД как есть: колонки уже типизированы,
+# поэтому повторная валидация response_model на каждой строке не нужна.
+# Модель остается в декораторе только для документации — возвращая Response
+# напрямую, FastAPI пропускает ее проверку и сериализацию.
+def starship_to_dict(starship):
+    return {
+        "name": starship.name,
+        "capacity": starship.capacity,
+        "volume": starship.volume,
+        "range": starship.range,
+        "status": starship.status,
+        "id": starship.id
+    }
+
+def starships_response(starships):
+    return ORJSONResponse([starship_to_dict(starship) for starship in starships])
+
+def cargo_response(cargo_items):
+    return ORJSONResponse([
+        {
+            "name": cargo.name,
+            "quantity": cargo.quantity,
+            "weight": cargo.weight,
+            "volume": cargo.volume,
+            "id": cargo.id
+        }
+        for cargo in cargo_items
+    ])
+
+def cached_response(namespace: str, request: Request, build):
+    """
+    Отдает готовый ответ из кэша, а при промахе строит его через build()
+    и сохраняет. Ключ — путь и строка запроса, поэтому страницы пагинации
+    кэшируются отдельно.
+
+    ETag считается по телу ответа: если у клиента та же версия
+    (If-None-Match), вместо тела возвращается пустой 304.
+    """
+    key = f"{request.url.path}?{request.url.query}"
+    # Поколение читается до build(): если данные изменятся, пока ответ
+    # строится, он сохранится под старым поколением и не будет отдан
+    generation = cache.generation(namespace)
+    body = cache.get(namespace, generation, key)
+    if body is None:
+        body = build().body
+        cache.store(namespace, generation, key, body)
+
+    etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def shipment_response(shipment, starship_name: str, cargo_name: str):
+    """
+    Собирает ответ ShipmentResponse: к данным погрузки добавляются названия
+    звездолета и груза. Названия передаются уже прочитанными до commit,
+    чтобы после него не перечитывать строки из БД.
+    """
+    return {
+        "id": shipment.id,
+        "starship_id": shipment.starship_id,
+        "starship_name": starship_name,
+        "cargo_id": shipment.cargo_id,
+        "cargo_name": cargo_name,
+        "quantity": shipment.quantity,
+        "status": shipment.status,
+        "created_at": shipment.created_at
+    }
+
+def get_current_load(db: Session, starship_id: int):
+    """
+    Возвращает суммарные вес и объем грузов, которые сейчас грузятся на
+    звездолет. Считается одним агрегирующим запросом на стороне БД.
+    """
+    return db.query(
+        func.coalesce(func.sum(models.ShipmentHistory.quantity * models.Cargo.weight), 0),
+        func.coalesce(func.sum(models.ShipmentHistory.quantity * models.Cargo.volume), 0)
+    ).join(
+        models.Cargo,
+        models.ShipmentHistory.cargo_id == models.Cargo.id
+    ).filter(
+        models.ShipmentHistory.starship_id == starship_id,
+        models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
+    ).one()
+
 @router.get(
     "/api/starships",
     response_model=List[schemas.Starship],
+    response_model_exclude_unset=True,
     tags=["starships"],
     summary="Получить список всех звездолетов"
 )
-async def get_all_starships(
+def get_all_starships(
     request: Request,
+    skip: int = Query(0, description="Количество пропускаемых записей", ge=0),
+    limit: int = Query(100, description="Максимальное количество возвращаемых записей", ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """
-    Получает список всех звездолетов.
+    Получает список всех звездолетов с поддержкой пагинации.
     """
-    return db.query(models.Starship).all()
+    return cached_response("starships", request, lambda: starships_response(
+        db.query(*STARSHIP_LIST_COLUMNS).order_by(models.Starship.id).offset(skip).limit(limit).all()
+    ))
 
 @router.get(
     "/api/starships/status/available",
     response_model=List[schemas.Starship],
+    response_model_exclude_unset=True,
     tags=["starships"],
-    summary="Получить список доступных звездолетов"
+    summary="Получить список доступных звездолетов",
+    dependencies=[Depends(get_current_user)]
 )
-async def get_available_starships(
+def get_available_starships(
     request: Request,
-    token: str = Depends(get_current_user),
+    skip: int = Query(0, description="Количество пропускаемых записей", ge=0),
+    limit: int = Query(100, description="Максимальное количество возвращаемых записей", ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """
-    Получает список всех звездолетов со статусом AVAILABLE.
+    Получает список всех звездолетов со статусом AVAILABLE с поддержкой пагинации.
     Требует JWT токен для авторизации.
     """
-    return db.query(models.Starship).filter(
-        models.Starship.status == schemas.StarshipStatus.AVAILABLE
-    ).all()
+    return cached_response("starships", request, lambda: starships_response(
+        db.query(*STARSHIP_LIST_COLUMNS).filter(
+            models.Starship.status == schemas.StarshipStatus.AVAILABLE
+        ).order_by(models.Starship.id).offset(skip).limit(limit).all()
+    ))
 
 @router.get(
     "/api/starships/{starship_id}",
     response_model=schemas.Starship,
+    response_model_exclude_unset=True,
     tags=["starships"],
     summary="Получить информацию о звездолете"
 )
-async def get_starship(
+def get_starship(
     request: Request,
     starship_id: int = Path(..., description="ID звездолета"),
     db: Session = Depends(get_db)
@@ -60,14 +215,22 @@ async def get_starship(
     """
     Получает информацию о конкретном звездолете по ID.
     """
-    starship = db.query(models.Starship).filter(models.Starship.id == starship_id).first()
-    if not starship:
-        raise HTTPException(status_code=404, detail="Звездолет не найден")
-    return starship
+    def build():
+        starship = db.query(*STARSHIP_LIST_COLUMNS).filter(
+            models.Starship.id == starship_id
+        ).first()
+        if not starship:
+            raise HTTPException(status_code=404, detail="Звездолет не найден")
+        return ORJSONResponse(starship_to_dict(starship))
+
+    # Карточка звездолета кэшируется в том же пространстве имен, что и
+    # списки, поэтому сбрасывается при любом изменении звездолетов
+    return cached_response("starships", request, build)
 
 @router.get(
     "/api/inventory",
     response_model=List[schemas.Cargo],
+    response_model_exclude_unset=True,
     tags=["cargo"],
     summary="Получить список всех грузов на складе",
     response_description="Список доступных грузов",
@@ -88,31 +251,26 @@ async def get_starship(
                 }
             }
         },
-        500: {
-            "description": "Внутренняя ошибка сервера",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Ошибка при получении списка грузов"}
-                }
-            }
-        }
+        500: SERVER_ERROR_500
     }
 )
-@limiter.limit(RATE_LIMIT_PER_MINUTE["default"])
-async def get_inventory(
+def get_inventory(
     request: Request,
     skip: int = Query(0, description="Количество пропускаемых записей", ge=0),
-    limit: int = Query(100, description="Максимальное количество возвращаемых записей", le=1000),
+    limit: int = Query(100, description="Максимальное количество возвращаемых записей", ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """
     Получает список всех грузов на складе с поддержкой пагинации.
     """
-    return db.query(models.Cargo).offset(skip).limit(limit).all()
+    return cached_response("cargo", request, lambda: cargo_response(
+        db.query(*CARGO_LIST_COLUMNS).offset(skip).limit(limit).all()
+    ))
 
 @router.post(
     "/api/load",
     response_model=schemas.ShipmentResponse,
+    response_model_exclude_unset=True,
     tags=["shipments"],
     summary="Создать новую погрузку",
     response_description="Данные созданной погрузки",
@@ -124,7 +282,9 @@ async def get_inventory(
                     "example": {
                         "id": 1,
                         "starship_id": 1,
+                        "starship_name": "Millennium Falcon",
                         "cargo_id": 1,
+                        "cargo_name": "Dilithium Crystals",
                         "quantity": 50,
                         "status": "loading",
                         "created_at": "2024-03-20T10:30:00"
@@ -132,19 +292,12 @@ async def get_inventory(
                 }
             }
         },
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Превышена грузоподъемность звездолета"}
-                }
-            }
-        },
+        400: error_response("Ошибка валидации", "Превышена грузоподъемность звездолета"),
         404: {"description": "Ресурс не найден"}
     }
 )
 @limiter.limit(RATE_LIMIT_PER_MINUTE["loading"])
-async def load_cargo(
+def load_cargo(
     request: Request,
     shipment: schemas.ShipmentCreate,
     db: Session = Depends(get_db)
@@ -160,8 +313,10 @@ async def load_cargo(
     - Не превышен ли объем грузового отсека
     - Достаточно ли места с учетом уже загруженных грузов
     """
-    # Проверяем существование звездолета
-    starship = db.query(models.Starship).filter(models.Starship.id == shipment.starship_id).first()
+    # Проверяем существование звездолета. Строка звездолета блокируется до
+    # конца транзакции: параллельные погрузки на тот же звездолет ждут,
+    # а не проходят проверку вместимости одновременно
+    starship = db.get(models.Starship, shipment.starship_id, with_for_update=True)
     if not starship:
         raise HTTPException(status_code=404, detail="Звездолет не найден")
     
@@ -169,29 +324,27 @@ async def load_cargo(
     if starship.status != schemas.StarshipStatus.AVAILABLE:
         raise HTTPException(status_code=400, detail="Звездолет недоступен для погрузки")
     
-    # Проверяем существование груза
-    cargo = db.query(models.Cargo).filter(models.Cargo.id == shipment.cargo_id).first()
-    if not cargo:
-        raise HTTPException(status_code=404, detail="Груз не найден")
-    
-    # Проверяем количество груза на складе
-    if cargo.quantity < shipment.quantity:
+    # Списываем груз со склада одним UPDATE ... RETURNING: он сработает,
+    # только если груза достаточно, и сразу вернет название, вес и объем единицы.
+    # Строка груза остается заблокированной до конца транзакции; если
+    # дальше проверка не пройдет, транзакция откатится вместе со списанием
+    cargo = db.execute(
+        update(models.Cargo)
+        .where(
+            models.Cargo.id == shipment.cargo_id,
+            models.Cargo.quantity >= shipment.quantity
+        )
+        .values(quantity=models.Cargo.quantity - shipment.quantity)
+        .returning(models.Cargo.name, models.Cargo.weight, models.Cargo.volume)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if cargo is None:
+        if not db.get(models.Cargo, shipment.cargo_id):
+            raise HTTPException(status_code=404, detail="Груз не найден")
         raise HTTPException(status_code=400, detail="Недостаточно груза на складе")
     
     # Получаем текущую загрузку звездолета
-    current_shipments = db.query(models.ShipmentHistory).filter(
-        models.ShipmentHistory.starship_id == starship.id,
-        models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
-    ).all()
-    
-    current_weight = sum(
-        sh.quantity * db.query(models.Cargo).get(sh.cargo_id).weight 
-        for sh in current_shipments
-    )
-    current_volume = sum(
-        sh.quantity * db.query(models.Cargo).get(sh.cargo_id).volume 
-        for sh in current_shipments
-    )
+    current_weight, current_volume = get_current_load(db, starship.id)
     
     # Проверяем новый груз
     new_weight = shipment.quantity * cargo.weight
@@ -211,46 +364,44 @@ async def load_cargo(
             detail=f"Превышен объем грузового отсека. Доступно: {starship.volume - current_volume} кубометров"
         )
     
-    # Создаем запись о погрузке
-    db_shipment = models.ShipmentHistory(
-        starship_id=shipment.starship_id,
-        cargo_id=shipment.cargo_id,
-        quantity=shipment.quantity,
-        status=schemas.ShipmentStatus.LOADING
-    )
+    # Создаем запись о погрузке: INSERT ... RETURNING сразу отдает id и
+    # created_at, повторный SELECT после commit не нужен
+    db_shipment = db.execute(
+        insert(models.ShipmentHistory)
+        .values(
+            starship_id=shipment.starship_id,
+            cargo_id=shipment.cargo_id,
+            quantity=shipment.quantity,
+            status=schemas.ShipmentStatus.LOADING
+        )
+        .returning(*models.ShipmentHistory.__table__.columns)
+    ).one()
     
-    # Обновляем количество груза и статус звездолета
-    cargo.quantity -= shipment.quantity
+    # Обновляем статус звездолета
     starship.status = schemas.StarshipStatus.LOADING
+    response = shipment_response(db_shipment, starship.name, cargo.name)
     
-    db.add(db_shipment)
     db.commit()
-    db.refresh(db_shipment)
-    return db_shipment
+    cache.invalidate("starships", "cargo")
+    return response
 
 @router.post(
     "/api/starships",
     response_model=schemas.Starship,
+    response_model_exclude_unset=True,
     tags=["starships"],
     status_code=status.HTTP_201_CREATED,
     summary="Создать новый звездолет",
     response_description="Созданный звездолет",
+    dependencies=[Depends(get_current_user)],
     responses={
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Звездолет с таким именем уже существует"}
-                }
-            }
-        }
+        400: STARSHIP_NAME_TAKEN_400
     }
 )
 @limiter.limit(RATE_LIMIT_PER_MINUTE["starship_creation"])
-async def create_starship(
+def create_starship(
     request: Request,
     starship: schemas.StarshipBase,
-    token: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -260,34 +411,33 @@ async def create_starship(
     - **capacity**: грузоподъемность в тоннах (0-1,000,000)
     - **range**: дальность полета в световых годах (0-10,000,000)
     """
-    # Проверяем уникальность имени
-    if db.query(models.Starship).filter(models.Starship.name == starship.name).first():
+    # INSERT ... RETURNING возвращает созданную строку без повторного SELECT.
+    # Уникальность имени гарантирует UNIQUE-ограничение в БД
+    try:
+        db_starship = db.execute(
+            insert(models.Starship)
+            .values(**starship.model_dump())
+            .returning(*models.Starship.__table__.columns)
+        ).one()
+        db.commit()
+        cache.invalidate("starships")
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Звездолет с таким именем уже существует")
-    
-    db_starship = models.Starship(**starship.dict())
-    db.add(db_starship)
-    db.commit()
-    db.refresh(db_starship)
     return db_starship
 
 @router.put(
     "/api/starships/{starship_id}",
     response_model=schemas.Starship,
+    response_model_exclude_unset=True,
     tags=["starships"],
     summary="Обновить данные звездолета",
     responses={
-        404: {"description": "Звездолет не найден"},
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Звездолет с таким именем уже существует"}
-                }
-            }
-        }
+        404: STARSHIP_NOT_FOUND_404,
+        400: STARSHIP_NAME_TAKEN_400
     }
 )
-async def update_starship(
+def update_starship(
     request: Request,
     starship_id: int = Path(..., description="ID звездолета для обновления"),
     starship_update: schemas.StarshipBase = Body(..., description="Новые данные звездолета"),
@@ -302,24 +452,30 @@ async def update_starship(
     
     Нельзя обновить звездолет, который находится в процессе погрузки или в полете.
     """
-    db_starship = db.query(models.Starship).filter(models.Starship.id == starship_id).first()
-    if not db_starship:
-        raise HTTPException(status_code=404, detail="Звездолет не найден")
+    # Проверка статуса и запись — один UPDATE ... RETURNING: обновленная
+    # строка возвращается сразу, без SELECT до и после изменения.
+    # Уникальность имени гарантирует UNIQUE-ограничение в БД
+    try:
+        db_starship = db.execute(
+            update(models.Starship)
+            .where(
+                models.Starship.id == starship_id,
+                models.Starship.status.in_([schemas.StarshipStatus.AVAILABLE, schemas.StarshipStatus.MAINTENANCE])
+            )
+            .values(**starship_update.model_dump(exclude_unset=True))
+            .returning(*models.Starship.__table__.columns)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        db.commit()
+        cache.invalidate("starships")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Звездолет с таким именем уже существует")
     
-    if db_starship.status not in [schemas.StarshipStatus.AVAILABLE, schemas.StarshipStatus.MAINTENANCE]:
+    if db_starship is None:
+        if not db.get(models.Starship, starship_id):
+            raise HTTPException(status_code=404, detail="Звездолет не найден")
         raise HTTPException(status_code=400, detail="Нельзя изменять данные звездолета в процессе погрузки или в полете")
-    
-    # Проверяем уникальность имени, если оно меняется
-    if starship_update.name != db_starship.name:
-        existing = db.query(models.Starship).filter(models.Starship.name == starship_update.name).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Звездолет с таким именем уже существует")
-    
-    for key, value in starship_update.dict().items():
-        setattr(db_starship, key, value)
-    
-    db.commit()
-    db.refresh(db_starship)
     return db_starship
 
 @router.delete(
@@ -328,18 +484,11 @@ async def update_starship(
     tags=["starships"],
     summary="Удалить звездолет",
     responses={
-        404: {"description": "Звездолет не найден"},
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Нельзя удалить звездолет, который используется"}
-                }
-            }
-        }
+        404: STARSHIP_NOT_FOUND_404,
+        400: error_response("Ошибка валидации", "Нельзя удалить звездолет, который используется")
     }
 )
-async def delete_starship(
+def delete_starship(
     request: Request,
     starship_id: int = Path(..., description="ID звездолета для удаления"),
     db: Session = Depends(get_db)
@@ -352,7 +501,7 @@ async def delete_starship(
     - Находится в полете
     - Имеет историю погрузок
     """
-    db_starship = db.query(models.Starship).filter(models.Starship.id == starship_id).first()
+    db_starship = db.get(models.Starship, starship_id)
     if not db_starship:
         raise HTTPException(status_code=404, detail="Звездолет не найден")
     
@@ -360,24 +509,30 @@ async def delete_starship(
         raise HTTPException(status_code=400, detail="Нельзя удалить звездолет в процессе погрузки или в полете")
     
     # Проверяем наличие истории погрузок
-    shipment_history = db.query(models.ShipmentHistory).filter(
-        models.ShipmentHistory.starship_id == starship_id
-    ).first()
+    has_history = db.query(
+        exists().where(models.ShipmentHistory.starship_id == starship_id)
+    ).scalar()
     
-    if shipment_history:
+    if has_history:
         raise HTTPException(status_code=400, detail="Нельзя удалить звездолет, у которого есть история погрузок")
     
     db.delete(db_starship)
     db.commit()
+    cache.invalidate("starships")
     return None
 
 @router.post(
     "/api/cargo",
     response_model=schemas.Cargo,
+    response_model_exclude_unset=True,
     tags=["cargo"],
     status_code=status.HTTP_201_CREATED,
-    summary="Добавить новый груз на склад"
+    summary="Добавить новый груз на склад",
+    responses={
+        400: CARGO_NAME_TAKEN_400
+    }
 )
+@limiter.limit(RATE_LIMIT_PER_MINUTE["cargo_creation"])
 def create_cargo(
     request: Request,
     cargo: schemas.CargoCreate = Body(...),
@@ -386,33 +541,39 @@ def create_cargo(
     """
     Добавляет новый тип груза на склад.
     """
-    existing = db.query(models.Cargo).filter(models.Cargo.name == cargo.name).first()
-    if existing:
+    # Уникальность названия гарантирует уникальный индекс в БД; в старых
+    # базах без него название проверяется отдельным запросом
+    if not cargo_name_is_unique() and db.query(
+        exists().where(models.Cargo.name == cargo.name)
+    ).scalar():
+        raise HTTPException(status_code=400, detail="Груз с таким названием уже существует")
+
+    # INSERT ... RETURNING возвращает созданную строку без повторного SELECT
+    try:
+        db_cargo = db.execute(
+            insert(models.Cargo)
+            .values(**cargo.model_dump())
+            .returning(*models.Cargo.__table__.columns)
+        ).one()
+        db.commit()
+        cache.invalidate("cargo")
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Груз с таким названием уже существует")
-    db_cargo = models.Cargo(**cargo.dict())
-    db.add(db_cargo)
-    db.commit()
-    db.refresh(db_cargo)
     return db_cargo
 
 @router.put(
     "/api/cargo/{cargo_id}",
     response_model=schemas.Cargo,
+    response_model_exclude_unset=True,
     tags=["cargo"],
     summary="Обновить данные груза",
     responses={
-        404: {"description": "Груз не найден"},
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Груз с таким названием уже существует"}
-                }
-            }
-        }
+        404: CARGO_NOT_FOUND_404,
+        400: CARGO_NAME_TAKEN_400
     }
 )
-async def update_cargo(
+def update_cargo(
     request: Request,
     cargo_id: int = Path(..., description="ID груза для обновления"),
     cargo_update: schemas.CargoBase = Body(..., description="Новые данные груза"),
@@ -426,21 +587,30 @@ async def update_cargo(
     - **weight**: новый вес единицы в тоннах (0-1,000)
     - **volume**: новый объем единицы в кубических метрах (0-1,000)
     """
-    db_cargo = db.query(models.Cargo).filter(models.Cargo.id == cargo_id).first()
-    if not db_cargo:
-        raise HTTPException(status_code=404, detail="Груз не найден")
-    
-    # Проверяем уникальность имени, если оно меняется
-    if cargo_update.name != db_cargo.name:
-        existing = db.query(models.Cargo).filter(models.Cargo.name == cargo_update.name).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Груз с таким названием уже существует")
-    
-    for key, value in cargo_update.dict().items():
-        setattr(db_cargo, key, value)
+    # Уникальность названия гарантирует уникальный индекс в БД; в старых
+    # базах без него название проверяется отдельным запросом
+    if cargo_update.name is not None and not cargo_name_is_unique() and db.query(
+        exists().where(models.Cargo.name == cargo_update.name, models.Cargo.id != cargo_id)
+    ).scalar():
+        raise HTTPException(status_code=400, detail="Груз с таким названием уже существует")
+
+    # Один UPDATE ... RETURNING вместо SELECT + UPDATE + SELECT
+    try:
+        db_cargo = db.execute(
+            update(models.Cargo)
+            .where(models.Cargo.id == cargo_id)
+            .values(**cargo_update.model_dump(exclude_unset=True))
+            .returning(*models.Cargo.__table__.columns)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        db.commit()
+        cache.invalidate("cargo")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Груз с таким названием уже существует")
     
-    db.commit()
-    db.refresh(db_cargo)
+    if db_cargo is None:
+        raise HTTPException(status_code=404, detail="Груз не найден")
     return db_cargo
 
 @router.delete(
@@ -449,18 +619,11 @@ async def update_cargo(
     tags=["cargo"],
     summary="Удалить груз",
     responses={
-        404: {"description": "Груз не найден"},
-        400: {
-            "description": "Ошибка валидации",
-            "content": {
-                "application/json": {
-                    "example": {"detail": "Нельзя удалить груз, который используется"}
-                }
-            }
-        }
+        404: CARGO_NOT_FOUND_404,
+        400: error_response("Ошибка валидации", "Нельзя удалить груз, который используется")
     }
 )
-async def delete_cargo(
+def delete_cargo(
     request: Request,
     cargo_id: int = Path(..., description="ID груза для удаления"),
     db: Session = Depends(get_db)
@@ -472,62 +635,101 @@ async def delete_cargo(
     - Используется в текущих погрузках
     - Имеет историю погрузок
     """
-    db_cargo = db.query(models.Cargo).filter(models.Cargo.id == cargo_id).first()
+    db_cargo = db.get(models.Cargo, cargo_id)
     if not db_cargo:
         raise HTTPException(status_code=404, detail="Груз не найден")
     
     # Проверяем наличие истории погрузок
-    shipment_history = db.query(models.ShipmentHistory).filter(
-        models.ShipmentHistory.cargo_id == cargo_id
-    ).first()
+    has_history = db.query(
+        exists().where(models.ShipmentHistory.cargo_id == cargo_id)
+    ).scalar()
     
-    if shipment_history:
+    if has_history:
         raise HTTPException(status_code=400, detail="Нельзя удалить груз, который использовался в погрузках")
     
     db.delete(db_cargo)
     db.commit()
+    cache.invalidate("cargo")
     return None
 
 @router.get(
     "/api/cargo",
     response_model=List[schemas.Cargo],
+    response_model_exclude_unset=True,
     tags=["cargo"],
     summary="Получить список всех грузов"
 )
-@limiter.limit(RATE_LIMIT_PER_MINUTE["default"])
-async def get_cargo(
+def get_cargo(
     request: Request,
     skip: int = Query(0, description="Количество пропускаемых записей", ge=0),
-    limit: int = Query(100, description="Максимальное количество возвращаемых записей", le=1000),
+    limit: int = Query(100, description="Максимальное количество возвращаемых записей", ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """
     Получает список всех грузов.
     """
-    return db.query(models.Cargo).offset(skip).limit(limit).all()
+    return cached_response("cargo", request, lambda: cargo_response(
+        db.query(*CARGO_LIST_COLUMNS).offset(skip).limit(limit).all()
+    ))
 
 @router.get(
     "/api/history",
     response_model=List[dict],
+    response_class=ORJSONResponse,
     tags=["history"],
     summary="Получить историю погрузок"
 )
 @limiter.limit(RATE_LIMIT_PER_MINUTE["history"])
-async def get_shipment_history(
+def get_shipment_history(
     request: Request,
     starship_id: Optional[int] = Query(None),
     cargo_id: Optional[int] = Query(None),
     status: Optional[schemas.ShipmentStatus] = Query(None),
     from_date: Optional[datetime] = Query(None),
     to_date: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db)
+    before_id: Optional[int] = Query(
+        None,
+        description="ID последней полученной записи: вернуть записи, идущие после нее (keyset-пагинация)"
+    ),
+    skip: int = Query(0, description="Количество пропускаемых записей", ge=0),
+    limit: int = Query(100, description="Максимальное количество возвращаемых записей", ge=1, le=1000)
 ):
     """
-    Получает историю погрузок с возможностью фильтрации.
+    Получает историю погрузок с возможностью фильтрации и пагинации.
     Возвращает подробную информацию о каждой операции.
-    """
-    query = db.query(
-        models.ShipmentHistory,
+
+    Для глубоких страниц вместо skip лучше передавать before_id — ID
+    последней записи предыдущей страницы: такой запрос не перебирает
+    пропущенные строки.
+    """
+    # Условия собираются в список и передаются в один where(): значения идут
+    # связанными параметрами, поэтому при одинаковом наборе фильтров SQL
+    # компилируется один раз и дальше берется из кэша SQLAlchemy
+    conditions = []
+    if starship_id is not None:
+        conditions.append(models.ShipmentHistory.starship_id == starship_id)
+    if cargo_id is not None:
+        conditions.append(models.ShipmentHistory.cargo_id == cargo_id)
+    if status is not None:
+        conditions.append(models.ShipmentHistory.status == status)
+    if from_date is not None:
+        conditions.append(models.ShipmentHistory.created_at >= from_date)
+    if to_date is not None:
+        conditions.append(models.ShipmentHistory.created_at <= to_date)
+    if before_id is not None:
+        cursor = select(
+            models.ShipmentHistory.created_at,
+            models.ShipmentHistory.id
+        ).where(models.ShipmentHistory.id == before_id).correlate(None).scalar_subquery()
+        conditions.append(
+            tuple_(models.ShipmentHistory.created_at, models.ShipmentHistory.id) < cursor
+        )
+    
+    statement = select(
+        models.ShipmentHistory.id,
+        models.ShipmentHistory.quantity,
+        HISTORY_STATUS_LABEL,
+        models.ShipmentHistory.created_at,
         models.Starship.name.label('starship_name'),
         models.Cargo.name.label('cargo_name')
     ).join(
@@ -536,46 +738,67 @@ async def get_shipment_history(
     ).join(
         models.Cargo,
         models.ShipmentHistory.cargo_id == models.Cargo.id
-    )
-    
-    if starship_id:
-        query = query.filter(models.ShipmentHistory.starship_id == starship_id)
-    if cargo_id:
-        query = query.filter(models.ShipmentHistory.cargo_id == cargo_id)
-    if status:
-        query = query.filter(models.ShipmentHistory.status == status)
-    if from_date:
-        query = query.filter(models.ShipmentHistory.created_at >= from_date)
-    if to_date:
-        query = query.filter(models.ShipmentHistory.created_at <= to_date)
-    
-    results = query.order_by(models.ShipmentHistory.created_at.desc()).all()
-    
-    # Словарь для перевода статусов
-    status_translations = {
-        'loading': 'Loading',
-        'completed': 'Completed',
-        'cancelled': 'Cancelled'
-    }
+    ).where(*conditions).order_by(
+        models.ShipmentHistory.created_at.desc(),
+        models.ShipmentHistory.id.desc()
+    ).offset(skip).limit(limit)
+    
+    # Строки читаются из БД пачками и сразу пишутся в ответ: память не растет
+    # вместе с выборкой, а первые байты уходят клиенту до конца запроса.
+    # Поток читает через собственную сессию: она должна жить, пока ответ
+    # отправляется. Запрос и первая пачка выполняются до начала ответа,
+    # поэтому ошибка БД доходит до обработчика ошибок как обычная 500,
+    # а не обрывает уже начатый ответ со статусом 200.
+    stream_db = open_session()
+    try:
+        partitions = stream_db.execute(
+            statement,
+            execution_options={"yield_per": HISTORY_STREAM_BATCH_SIZE}
+        ).partitions()
+        first_rows = next(partitions, [])
+    except Exception:
+        stream_db.close()
+        raise
 
-    return [
-        {
-            "id": result.ShipmentHistory.id,
-            "starship": result.starship_name,
-            "cargo": result.cargo_name,
-            "quantity": result.ShipmentHistory.quantity,
-            "status": status_translations.get(result.ShipmentHistory.status, result.ShipmentHistory.status),
-            "created_at": result.ShipmentHistory.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        for result in results
-    ]
+    def stream_history():
+        try:
+            separator = b"["
+            for rows in chain((first_rows,), partitions):
+                chunk = bytearray()
+                for row in rows:
+                    chunk += separator
+                    chunk += orjson.dumps({
+                        "id": row.id,
+                        "starship": row.starship_name,
+                        "cargo": row.cargo_name,
+                        "quantity": row.quantity,
+                        "status": row.status,
+                        # То же, что strftime("%Y-%m-%d %H:%M:%S"), но вдвое быстрее;
+                        # срез отбрасывает смещение часового пояса
+                        "created_at": row.created_at.isoformat(" ", "seconds")[:19]
+                    })
+                    separator = b","
+                if chunk:
+                    yield bytes(chunk)
+            yield b"[]" if separator == b"[" else b"]"
+        finally:
+            stream_db.close()
+
+    # background закрывает сессию и тогда, когда генератор так и не был запущен
+    return StreamingResponse(
+        stream_history(),
+        media_type="application/json",
+        background=BackgroundTask(stream_db.close)
+    )
 
 @router.post(
     "/api/load/cancel/{shipment_id}",
     response_model=schemas.ShipmentResponse,
+    response_model_exclude_unset=True,
     tags=["shipments"],
     summary="Отменить погрузку"
 )
+@limiter.limit(RATE_LIMIT_PER_MINUTE["loading"])
 def cancel_loading(
     request: Request,
     shipment_id: int = Path(..., description="ID погрузки для отмены"),
@@ -584,45 +807,52 @@ def cancel_loading(
     """
     Отменяет процесс погрузки и возвращает груз на склад.
     """
-    try:
-        shipment = db.query(models.ShipmentHistory).filter(models.ShipmentHistory.id == shipment_id).first()
-        if not shipment:
+    # Отмена и проверка статуса — один UPDATE ... WHERE status = 'loading':
+    # из двух одновременных отмен сработает только одна, и груз не
+    # вернется на склад дважды
+    shipment = db.execute(
+        update(models.ShipmentHistory)
+        .where(
+            models.ShipmentHistory.id == shipment_id,
+            models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
+        )
+        .values(status=schemas.ShipmentStatus.CANCELLED)
+        .returning(*models.ShipmentHistory.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if shipment is None:
+        if not db.get(models.ShipmentHistory, shipment_id):
             raise HTTPException(status_code=404, detail="Погрузка не найдена")
+        raise HTTPException(status_code=400, detail="Можно отменить только погрузки в статусе 'loading'")
 
-        if shipment.status != schemas.ShipmentStatus.LOADING:
-            raise HTTPException(status_code=400, detail="Можно отменить только погрузки в статусе 'loading'")
-
-        cargo = db.query(models.Cargo).filter(models.Cargo.id == shipment.cargo_id).first()
-        if not cargo:
-            raise HTTPException(status_code=404, detail="Груз не найден")
-        cargo.quantity += shipment.quantity
-
-        starship = db.query(models.Starship).filter(models.Starship.id == shipment.starship_id).first()
-        if not starship:
-            raise HTTPException(status_code=404, detail="Звездолет не найден")
-        starship.status = schemas.StarshipStatus.AVAILABLE
+    # Возвращаем груз на склад атомарным UPDATE, не читая строку груза
+    cargo_name = db.execute(
+        update(models.Cargo)
+        .where(models.Cargo.id == shipment.cargo_id)
+        .values(quantity=models.Cargo.quantity + shipment.quantity)
+        .returning(models.Cargo.name)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if cargo_name is None:
+        raise HTTPException(status_code=404, detail="Груз не найден")
 
-        shipment.status = schemas.ShipmentStatus.CANCELLED
+    starship = db.get(models.Starship, shipment.starship_id)
+    if not starship:
+        raise HTTPException(status_code=404, detail="Звездолет не найден")
+    starship.status = schemas.StarshipStatus.AVAILABLE
+    response = shipment_response(shipment, starship.name, cargo_name)
 
-        db.commit()
-        db.refresh(shipment)
-        return shipment
-    except HTTPException as he:
-        db.rollback()
-        raise he
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail="Произошла ошибка при отмене погрузки"
-        )
+    db.commit()
+    cache.invalidate("starships", "cargo")
+    return response
 
 @router.get(
     "/api/starships/{starship_id}/load",
+    response_class=ORJSONResponse,
     tags=["starships"],
     summary="Получить информацию о текущей загрузке звездолета"
 )
-async def get_starship_load(
+def get_starship_load(
     request: Request,
     starship_id: int = Path(..., description="ID звездолета"),
     db: Session = Depends(get_db)
@@ -635,24 +865,40 @@ async def get_starship_load(
     - Оставшийся объем
     - Список загруженных грузов
     """
-    starship = db.query(models.Starship).filter(models.Starship.id == starship_id).first()
+    starship = db.get(models.Starship, starship_id)
     if not starship:
         raise HTTPException(status_code=404, detail="Звездолет не найден")
     
-    current_shipments = db.query(models.ShipmentHistory).filter(
+    # Погрузки вместе с данными грузов — одним JOIN-запросом, выбираются
+    # только нужные колонки, без загрузки ORM-объектов
+    current_shipments = db.query(
+        models.ShipmentHistory.quantity,
+        models.Cargo.name,
+        models.Cargo.weight,
+        models.Cargo.volume
+    ).join(
+        models.Cargo,
+        models.ShipmentHistory.cargo_id == models.Cargo.id
+    ).filter(
         models.ShipmentHistory.starship_id == starship.id,
         models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
     ).all()
-    
-    current_weight = sum(
-        sh.quantity * db.query(models.Cargo).get(sh.cargo_id).weight 
-        for sh in current_shipments
-    )
-    current_volume = sum(
-        sh.quantity * db.query(models.Cargo).get(sh.cargo_id).volume 
-        for sh in current_shipments
-    )
-    
+
+    current_weight = 0
+    current_volume = 0
+    loaded_cargo = []
+    for sh in current_shipments:
+        weight = sh.quantity * sh.weight
+        volume = sh.quantity * sh.volume
+        current_weight += weight
+        current_volume += volume
+        loaded_cargo.append({
+            "cargo_name": sh.name,
+            "quantity": sh.quantity,
+            "weight": weight,
+            "volume": volume
+        })
+
     return {
         "starship_name": starship.name,
         "total_capacity": starship.capacity,
@@ -661,24 +907,17 @@ async def get_starship_load(
         "current_volume": current_volume,
         "available_weight": starship.capacity - current_weight,
         "available_volume": starship.volume - current_volume,
-        "loaded_cargo": [
-            {
-                "cargo_name": db.query(models.Cargo).get(sh.cargo_id).name,
-                "quantity": sh.quantity,
-                "weight": sh.quantity * db.query(models.Cargo).get(sh.cargo_id).weight,
-                "volume": sh.quantity * db.query(models.Cargo).get(sh.cargo_id).volume
-            }
-            for sh in current_shipments
-        ]
+        "loaded_cargo": loaded_cargo
     }
 
 @router.put(
     "/api/starships/{starship_id}/status",
     response_model=schemas.Starship,
+    response_model_exclude_unset=True,
     tags=["starships"],
     summary="Изменить статус звездолета"
 )
-async def update_starship_status(
+def update_starship_status(
     request: Request,
     starship_id: int = Path(..., description="ID звездолета"),
     new_status: schemas.StarshipStatus = Body(..., description="Новый статус звездолета"),
@@ -693,17 +932,19 @@ async def update_starship_status(
     * in_flight - в полёте
     * loading - идёт погрузка
     """
-    starship = db.query(models.Starship).filter(models.Starship.id == starship_id).first()
+    starship = db.get(models.Starship, starship_id)
     if not starship:
         raise HTTPException(status_code=404, detail="Звездолет не найден")
     
     # Проверяем возможность изменения статуса
     if starship.status == schemas.StarshipStatus.LOADING:
-        active_shipments = db.query(models.ShipmentHistory).filter(
-            models.ShipmentHistory.starship_id == starship_id,
-            models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
-        ).first()
-        if active_shipments:
+        has_active_shipments = db.query(
+            exists().where(
+                models.ShipmentHistory.starship_id == starship_id,
+                models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING
+            )
+        ).scalar()
+        if has_active_shipments:
             raise HTTPException(
                 status_code=400, 
                 detail="Невозможно изменить статус: есть активные погрузки"
@@ -711,16 +952,18 @@ async def update_starship_status(
     
     starship.status = new_status
     db.commit()
+    cache.invalidate("starships")
     db.refresh(starship)
     return starship
 
 @router.put(
     "/api/shipments/{shipment_id}/status",
     response_model=schemas.ShipmentResponse,
+    response_model_exclude_unset=True,
     tags=["shipments"],
     summary="Изменить статус погрузки"
 )
-async def update_shipment_status(
+def update_shipment_status(
     request: Request,
     shipment_id: int = Path(..., description="ID погрузки"),
     new_status: schemas.ShipmentStatus = Body(..., description="Новый статус погрузки"),
@@ -737,42 +980,41 @@ async def update_shipment_status(
     При отмене погрузки груз возвращается на склад.
     При завершении погрузки звездолет становится доступным для полета.
     """
-    shipment = db.query(models.ShipmentHistory).filter(
-        models.ShipmentHistory.id == shipment_id
-    ).first()
+    shipment = db.get(models.ShipmentHistory, shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="Погрузка не найдена")
     
-    # Получаем связанные объекты
-    starship = db.query(models.Starship).filter(
-        models.Starship.id == shipment.starship_id
-    ).first()
-    cargo = db.query(models.Cargo).filter(
-        models.Cargo.id == shipment.cargo_id
-    ).first()
+    # Получаем связанный звездолет
+    starship = db.get(models.Starship, shipment.starship_id)
     
     # Обработка изменения статуса
     if new_status == schemas.ShipmentStatus.CANCELLED:
-        # Возвращаем груз на склад
-        cargo.quantity += shipment.quantity
-        # Освобождаем звездолет
-        if not db.query(models.ShipmentHistory).filter(
-            models.ShipmentHistory.starship_id == starship.id,
-            models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING,
-            models.ShipmentHistory.id != shipment_id
-        ).first():
-            starship.status = schemas.StarshipStatus.AVAILABLE
-            
-    elif new_status == schemas.ShipmentStatus.COMPLETED:
-        # Делаем звездолет доступным для полета
-        if not db.query(models.ShipmentHistory).filter(
-            models.ShipmentHistory.starship_id == starship.id,
-            models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING,
-            models.ShipmentHistory.id != shipment_id
-        ).first():
+        # Возвращаем груз на склад атомарным UPDATE, название груза для
+        # ответа приходит из RETURNING
+        cargo_name = db.execute(
+            update(models.Cargo)
+            .where(models.Cargo.id == shipment.cargo_id)
+            .values(quantity=models.Cargo.quantity + shipment.quantity)
+            .returning(models.Cargo.name)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+    else:
+        cargo_name = db.scalar(select(models.Cargo.name).where(models.Cargo.id == shipment.cargo_id))
+
+    if new_status in (schemas.ShipmentStatus.CANCELLED, schemas.ShipmentStatus.COMPLETED):
+        # Освобождаем звездолет, если у него не осталось других активных погрузок
+        has_other_shipments = db.query(
+            exists().where(
+                models.ShipmentHistory.starship_id == starship.id,
+                models.ShipmentHistory.status == schemas.ShipmentStatus.LOADING,
+                models.ShipmentHistory.id != shipment_id
+            )
+        ).scalar()
+        if not has_other_shipments:
             starship.status = schemas.StarshipStatus.AVAILABLE
     
     shipment.status = new_status
+    response = shipment_response(shipment, starship.name, cargo_name)
     db.commit()
-    db.refresh(shipment)
-    return shipment 
\ No newline at end of file
+    cache.invalidate("starships", "cargo")
+    return response
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 import enum
@@ -38,18 +38,6 @@ class StarshipBase(BaseModel):
     )
     status: StarshipStatus = Field(default=StarshipStatus.AVAILABLE, description="Статус звездолета")
 
-    @validator('capacity')
-    def validate_capacity(cls, v):
-        if v > 1000000:  # максимум 1000 тонн
-            raise ValueError('Грузоподъемность не может превышать 1000 тонн')
-        return v
-
-    @validator('range')
-    def validate_range(cls, v):
-        if v > 100000000:  # максимум 100 млн км
-            raise ValueError('Дальность не может превышать 100 млн километров')
-        return v
-
 
 class StarshipCreate(StarshipBase):
     pass
@@ -65,8 +53,7 @@ class StarshipUpdate(StarshipBase):
 class Starship(StarshipBase):
     id: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class CargoBase(BaseModel):
@@ -95,12 +82,6 @@ class CargoBase(BaseModel):
         description="Объем одной единицы в кубических метрах (от 0 до 1,000)"
     )
 
-    @validator('weight', 'volume')
-    def validate_positive(cls, v):
-        if v <= 0:
-            raise ValueError("Значение должно быть положительным")
-        return v
-
 
 class CargoCreate(CargoBase):
     pass
@@ -116,8 +97,7 @@ class CargoUpdate(CargoBase):
 class Cargo(CargoBase):
     id: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ShipmentStatus(str, enum.Enum):
@@ -146,8 +126,7 @@ class ShipmentResponse(BaseModel):
     status: ShipmentStatus
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ErrorResponse(BaseModel):
@@ -1,4 +1,4 @@
-from fastapi import HTTPException, Security, Depends
+from fastapi import Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 security = HTTPBearer()
@@ -8,12 +8,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Security(securi
     """
     Проверяет наличие токена в заголовке Authorization.
     Фактическая валидация токена происходит на фронтенде.
+
+    Запрос без заголовка или с пустым токеном отклоняет сам HTTPBearer.
     """
-    token = credentials.credentials
-    if not token:
-        raise HTTPException(
-            status_code=401,
-            detail="Missing authentication token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return token
+    return credentials.credentials
@@ -1,15 +1,23 @@
 import os
 import logging
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
-# Загружаем переменные окружения
-load_dotenv()
+# Загружаем переменные окружения из .env рядом с config.py, если он есть.
+# В продакшене файла нет — переменные уже в окружении, и .env не ищется
+# по дереву каталогов при каждом старте процесса
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(ENV_FILE):
+    load_dotenv(ENV_FILE)
 
 # Настройки сервера
 HOST = "0.0.0.0"  # Для Railway нужно использовать 0.0.0.0
 PORT = int(os.getenv("PORT", 8080))  # Railway предоставляет порт через переменную окружения
+# Число процессов uvicorn. У каждого свой пул соединений с БД
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW), поэтому по умолчанию один процесс
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
 
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -20,30 +28,65 @@ if not DATABASE_URL:
     # БД-эндпоинты вернут понятную 503.
     logger.warning("DATABASE_URL не задан — эндпоинты, работающие с БД, будут недоступны")
 
-# CORS
-CORS_ORIGINS = [
-    "http://localhost",
-    "http://localhost:8080",
-    "https://localhost",
-    "https://localhost:8080",
-    "*",  # Для тестирования, в продакшене лучше указать конкретные домены
-]
+# Создавать таблицы при старте приложения. Можно отключить, если схемой
+# управляют отдельно: тогда старт не тратит запросы к каталогу БД.
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "true").lower() == "true"
+
+# Пул соединений с БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 40))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # секунды
+# Сколько соединений открыть заранее при старте каждого воркера. По умолчанию
+# прогрева нет: WEB_CONCURRENCY воркеров сразу заняли бы соединения Postgres
+# (max_connections) еще до первого запроса. Не больше DB_POOL_SIZE
+DB_POOL_WARMUP = min(int(os.getenv("DB_POOL_WARMUP", 0)), DB_POOL_SIZE)
+SLOW_QUERY_MS = 50  # Запросы дольше этого порога пишутся в лог
+
+# CORS: конкретные домены фронтенда через запятую в CORS_ORIGINS
+CORS_ORIGINS = tuple(
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS",
+        "http://localhost,http://localhost:8080,https://localhost,https://localhost:8080"
+    ).split(",")
+    if origin.strip()
+)
+CORS_MAX_AGE = 86400  # Сколько секунд браузер кэширует ответ на preflight (Access-Control-Max-Age)
 
 # Project
 PROJECT_NAME = "Starship Warehouse API"
 VERSION = "1.0.0"
 
 # Rate Limiting
-RATE_LIMIT_PER_MINUTE = {
+# Только для чтения: slowapi разбирает строки лимитов один раз при
+# объявлении роутов, менять их во время работы бессмысленно
+RATE_LIMIT_PER_MINUTE = MappingProxyType({
     "default": "100/minute",
     "starship_creation": "20/minute",
+    "cargo_creation": "20/minute",
     "loading": "30/minute",
     "history": "200/minute"
-}
+})
+
+# Сколько строк истории читать из БД за одну пачку при потоковой отдаче
+HISTORY_STREAM_BATCH_SIZE = 500
+
+# Redis (например, redis://host:6379/0) для счетчиков лимитов и кэша ответов
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Хранилище счетчиков лимитов: Redis делает лимиты общими для всех воркеров;
+# без REDIS_URL счетчики живут в памяти процесса
+RATE_LIMIT_STORAGE_URI = REDIS_URL or "memory://"
+RATE_LIMIT_STRATEGY = "moving-window"  # скользящее окно; в Redis считается атомарно Lua-скриптом
+
+# Cache Settings
+CACHE_TTL_SECONDS = 30  # Сколько секунд хранить ответы списков звездолетов и грузов
 
 # Cleanup Settings
 CLEANUP_HISTORY_DAYS = 1  # Количество дней хранения истории
 STUCK_LOADING_HOURS = 1   # Количество часов до освобождения "зависших" кораблей
+CLEANUP_BATCH_SIZE = 10000  # Сколько записей истории удалять за одну транзакцию
+CLEANUP_SHIPS_BATCH_SIZE = 500  # Сколько зависших кораблей освобождать за одну транзакцию
 
 # API Settings
 API_V1_STR = "/api"
@@ -1,39 +1,35 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
+from app.db import log_slow_queries
 from app.models import Base, Starship, Cargo, ShipmentHistory
 from app.schemas import StarshipStatus, ShipmentStatus
-import os
-from dotenv import load_dotenv
 
-# Загружаем переменные окружения из файла .env
-load_dotenv()
-
-# Получаем URL подключения из переменной окружения
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Настройки, включая DATABASE_URL из окружения и .env, читаются один раз в config
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE
 
 # Проверяем, корректно ли загружена строка подключения
 if not DATABASE_URL:
     raise ValueError("Переменная окружения DATABASE_URL не установлена!")
 
-# Создаем подключение к базе данных
+# Создаем подключение к базе данных. Пул настроен так же, как у приложения;
+# вместо вывода каждого запроса (echo) логируются только медленные
 try:
     engine = create_engine(
         DATABASE_URL,
-        echo=True,
         future=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=30,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        pool_use_lifo=True,
+        # Кодировка передается в параметрах подключения, отдельный
+        # SET client_encoding на каждое новое соединение не нужен
         connect_args={
             "client_encoding": "utf8"
         }
     )
-
-
-    # Устанавливаем кодировку для соединения
-    @event.listens_for(engine, 'connect')
-    def set_encoding(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute('SET client_encoding TO utf8')
-        cursor.close()
-
+    log_slow_queries(engine)
 
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 except Exception as e:
@@ -44,99 +40,98 @@ except Exception as e:
 # Функция для создания тестовых данных
 def create_test_data(db):
     try:
-        # Проверяем, есть ли уже данные в базе
-        existing_starships = db.query(Starship).first()
-        existing_cargo = db.query(Cargo).first()
-        
-        if existing_starships or existing_cargo:
-            print("Тестовые данные уже существуют в базе")
-            return
-
-        # Создаем тестовые звездолеты
-        starships = [
-            Starship(
-                name="Millennium Falcon",
-                capacity=100000,
-                volume=50000,
-                range=1000000,
-                status=StarshipStatus.AVAILABLE
-            ),
-            Starship(
-                name="Battlestar Galactica",
-                capacity=500000,
-                volume=250000,
-                range=2000000,
-                status=StarshipStatus.MAINTENANCE
-            ),
-            Starship(
-                name="USS Enterprise",
-                capacity=300000,
-                volume=150000,
-                range=1500000,
-                status=StarshipStatus.AVAILABLE
+        # Вся работа идет в одной транзакции: при ошибке она откатывается
+        # целиком, при успехе фиксируется одним commit
+        with db.begin():
+            # Есть ли уже данные в базе — один запрос с двумя EXISTS
+            has_data = db.scalar(
+                select(select(Starship.id).exists() | select(Cargo.id).exists())
             )
-        ]
-
-        # Создаем тестовые грузы
-        cargos = [
-            Cargo(
-                name="Dilithium Crystals",
-                quantity=1000,
-                weight=10.5,
-                volume=2.3
-            ),
-            Cargo(
-                name="Quantum Torpedoes",
-                quantity=500,
-                weight=50.0,
-                volume=10.0
-            ),
-            Cargo(
-                name="Medical Supplies",
-                quantity=2000,
-                weight=5.0,
-                volume=8.0
-            )
-        ]
-
-        # Добавляем данные в базу
-        for starship in starships:
-            db.add(starship)
-        for cargo in cargos:
-            db.add(cargo)
-
-        # Создаем тестовую историю погрузок
-        db.commit()  # Коммитим чтобы получить ID созданных объектов
-
-        shipments = [
-            ShipmentHistory(
-                starship_id=1,
-                cargo_id=1,
-                quantity=100,
-                status=ShipmentStatus.COMPLETED
-            ),
-            ShipmentHistory(
-                starship_id=3,
-                cargo_id=2,
-                quantity=50,
-                status=ShipmentStatus.LOADING
-            ),
-            ShipmentHistory(
-                starship_id=1,
-                cargo_id=3,
-                quantity=200,
-                status=ShipmentStatus.CANCELLED
-            )
-        ]
-
-        for shipment in shipments:
-            db.add(shipment)
+            if has_data:
+                print("Тестовые данные уже существуют в базе")
+                return
+
+            # Создаем тестовые звездолеты
+            starships = [
+                Starship(
+                    name="Millennium Falcon",
+                    capacity=100000,
+                    volume=50000,
+                    range=1000000,
+                    status=StarshipStatus.AVAILABLE
+                ),
+                Starship(
+                    name="Battlestar Galactica",
+                    capacity=500000,
+                    volume=250000,
+                    range=2000000,
+                    status=StarshipStatus.MAINTENANCE
+                ),
+                Starship(
+                    name="USS Enterprise",
+                    capacity=300000,
+                    volume=150000,
+                    range=1500000,
+                    status=StarshipStatus.AVAILABLE
+                )
+            ]
+
+            # Создаем тестовые грузы
+            cargos = [
+                Cargo(
+                    name="Dilithium Crystals",
+                    quantity=1000,
+                    weight=10.5,
+                    volume=2.3
+                ),
+                Cargo(
+                    name="Quantum Torpedoes",
+                    quantity=500,
+                    weight=50.0,
+                    volume=10.0
+                ),
+                Cargo(
+                    name="Medical Supplies",
+                    quantity=2000,
+                    weight=5.0,
+                    volume=8.0
+                )
+            ]
+
+            # Добавляем данные в базу. add_all и flush отправляют строки пачкой
+            # (executemany) и сразу заполняют ID, отдельный commit не нужен
+            db.add_all(starships)
+            db.add_all(cargos)
+            db.flush()
+
+            # Создаем тестовую историю погрузок
+
+            shipments = [
+                ShipmentHistory(
+                    starship_id=1,
+                    cargo_id=1,
+                    quantity=100,
+                    status=ShipmentStatus.COMPLETED
+                ),
+                ShipmentHistory(
+                    starship_id=3,
+                    cargo_id=2,
+                    quantity=50,
+                    status=ShipmentStatus.LOADING
+                ),
+                ShipmentHistory(
+                    starship_id=1,
+                    cargo_id=3,
+                    quantity=200,
+                    status=ShipmentStatus.CANCELLED
+                )
+            ]
+
+            db.add_all(shipments)
 
-        db.commit()
         print("Тестовые данные успешно созданы")
 
     except Exception as e:
-        db.rollback()
         print(f"Ошибка при создании тестовых данных: {e}")
         raise
 
@@ -148,9 +143,8 @@ def init_db():
         print("Таблицы успешно созданы.")
 
         # Создаем сессию и добавляем тестовые данные
-        db = SessionLocal()
-        create_test_data(db)
-        db.close()
+        with SessionLocal() as db:
+            create_test_data(db)
 
     except Exception as e:
         print(f"Ошибка при инициализации базы данных: {e}")
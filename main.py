@@ -1,9 +1,14 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from slowapi.middleware import SlowAPIASGIMiddleware
 
-from app.api import custom_openapi
+from app.api import custom_openapi, generate_operation_id, openapi_response
 from app.middleware import log_requests_middleware
 from app.exceptions import (
     http_exception_handler,
@@ -13,17 +18,93 @@ from app.exceptions import (
 from app.limiter import limiter
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException
-from config import HOST, PORT, CORS_ORIGINS, PROJECT_NAME, VERSION
+from config import (
+    HOST,
+    PORT,
+    WEB_CONCURRENCY,
+    CORS_ORIGINS,
+    CORS_MAX_AGE,
+    PROJECT_NAME,
+    VERSION,
+    AUTO_CREATE_SCHEMA,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_WARMUP,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Создаем приложение
-app = FastAPI()
+# Инициализация БД при старте — отказоустойчиво.
+# Если БД недоступна, приложение всё равно поднимется (отдаст /docs и /health),
+# а не упадёт целиком с 502 на этапе импорта.
+from app.db import check_cargo_name_unique, engine, init_models
+
 
-# Регистрируем лимитер
+def init_database():
+    """Создает схему и проверяет БД. Возвращает False, если БД недоступна."""
+    if engine is None:
+        logger.error("DATABASE_URL не задан — работа с БД недоступна")
+        return False
+    try:
+        if AUTO_CREATE_SCHEMA:
+            init_models()
+            logger.info("База данных инициализирована успешно")
+        else:
+            logger.info("AUTO_CREATE_SCHEMA выключен — создание таблиц пропущено")
+        check_cargo_name_unique()
+    except Exception:
+        logger.exception(
+            "Не удалось инициализировать БД при старте. Приложение поднято, "
+            "но эндпоинты, работающие с БД, будут возвращать ошибки."
+        )
+        return False
+    return True
+
+
+def warm_pool():
+    """Заранее открывает DB_POOL_WARMUP соединений, чтобы первые запросы
+    не тратили время на установку соединения с БД."""
+    connections = []
+    try:
+        for _ in range(DB_POOL_WARMUP):
+            connections.append(engine.connect())
+    except Exception:
+        logger.warning("Не удалось прогреть пул соединений с БД", exc_info=True)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Обработчики роутов синхронные и выполняются в пуле потоков anyio (по
+    # умолчанию 40 потоков). Подгоняем его под пул соединений с БД, чтобы
+    # потоков хватало на все соединения и запросы не упирались в пул потоков.
+    to_thread.current_default_thread_limiter().total_tokens = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # Работа с БД при старте блокирует, поэтому уходит в поток
+    if await to_thread.run_sync(init_database) and DB_POOL_WARMUP:
+        await to_thread.run_sync(warm_pool)
+    yield
+    if engine is not None:
+        engine.dispose()
+
+
+# Создаем приложение. Встроенные /openapi.json и /docs отключены: схема
+# отдаётся заранее сериализованной (см. openapi_json ниже)
+app = FastAPI(
+    lifespan=lifespan,
+    generate_unique_id_function=generate_operation_id,
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+)
+
+# Регистрируем лимитер: общий лимит для всех роутов без собственного
+# @limiter.limit, служебные роуты помечены limiter.exempt
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_middleware(SlowAPIASGIMiddleware)
 
 # Регистрируем обработчики ошибок
 app.add_exception_handler(HTTPException, http_exception_handler)
@@ -44,7 +125,7 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
     expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
-    max_age=3600,
+    max_age=CORS_MAX_AGE,
 )
 
 # Импортируем все роуты
@@ -52,25 +133,8 @@ from app.routes import router
 app.include_router(router)
 
 
-# Инициализация БД при старте — отказоустойчиво.
-# Если БД недоступна, приложение всё равно поднимется (отдаст /docs и /health),
-# а не упадёт целиком с 502 на этапе импорта.
-from app.db import init_models
-
-
-@app.on_event("startup")
-def on_startup():
-    try:
-        init_models()
-        logger.info("База данных инициализирована успешно")
-    except Exception:
-        logger.exception(
-            "Не удалось инициализировать БД при старте. Приложение поднято, "
-            "но эндпоинты, работающие с БД, будут возвращать ошибки."
-        )
-
-
 @app.get("/", include_in_schema=False)
+@limiter.exempt
 def root():
     """Корень сервиса — короткая навигация."""
     return {
@@ -82,7 +146,26 @@ def root():
     }
 
 
+@app.get("/openapi.json", include_in_schema=False)
+@limiter.exempt
+async def openapi_json():
+    return openapi_response(app)
+
+
+@app.get("/docs", include_in_schema=False)
+@limiter.exempt
+async def swagger_ui():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{PROJECT_NAME} - Swagger UI")
+
+
+@app.get("/redoc", include_in_schema=False)
+@limiter.exempt
+async def redoc():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{PROJECT_NAME} - ReDoc")
+
+
 @app.get("/health", tags=["service"], summary="Проверка живости сервиса")
+@limiter.exempt
 def health():
     """Liveness-проба для Railway. Не обращается к БД, поэтому отвечает 200,
     даже если база временно недоступна — это позволяет деплою пройти."""
@@ -92,9 +175,12 @@ def health():
 # Если запускаем напрямую
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn[standard] сам выбирает uvloop и httptools, если они установлены
     uvicorn.run(
         "main:app",
         host=HOST,
         port=PORT,
+        workers=WEB_CONCURRENCY,
+        access_log=False,  # запросы и так логирует log_requests_middleware
         reload=False  # На продакшене отключаем автоперезагрузку
     )